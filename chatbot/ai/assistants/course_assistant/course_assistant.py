@@ -1,20 +1,21 @@
 import asyncio
 
-from dotenv import load_dotenv
-
 from chatbot.ai.assistants.course_assistant.prompts.general_course_assistant_prompt import \
-    GENERAL_COURSE_ASSISTANT_SYSTEM_TEMPLATE
-
-load_dotenv()
+    GENERAL_COURSE_ASSISTANT_SYSTEM_TEMPLATE, COURSE_ASSISTANT_HUMAN_INPUT_TEMPLATE
+from chatbot.ai.chat_llm import create_chat_llm
+from chatbot.ai.exact_response_cache import ExactResponseCache
 from langchain import LLMChain, OpenAI
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 from langchain.chat_models import ChatOpenAI
 from langchain.memory import ConversationSummaryBufferMemory
+from langchain.schema import BaseMemory
 from langchain.prompts import (
     HumanMessagePromptTemplate,
     ChatPromptTemplate, SystemMessagePromptTemplate,
 )
 
+# shared by every CourseAssistant in deterministic mode
+_deterministic_response_cache = ExactResponseCache()
+
 
 class CourseAssistant:
     def __init__(self,
@@ -22,19 +23,34 @@ class CourseAssistant:
                  model_name="gpt-4",
                  prompt: str = GENERAL_COURSE_ASSISTANT_SYSTEM_TEMPLATE,
                  student_summary: str = None,
+                 llm: ChatOpenAI = None,
+                 memory: BaseMemory = None,
+                 verbose: bool = False,
+                 deterministic: bool = False,
                  ):
-        self._chat_llm = ChatOpenAI(
-            streaming=True,
-            callbacks=[StreamingStdOutCallbackHandler()],
-            temperature=temperature,
-            model_name=model_name,
-        )
+        self._deterministic = deterministic
+        if deterministic:
+            # a repeated turn can only be answered from the cache if the model would have given the same reply anyway
+            temperature = 0
+            if llm is not None:
+                llm = llm.copy(update={"temperature": 0})
+
+        if llm is None:
+            llm = create_chat_llm(temperature=temperature,
+                                  model_name=model_name)
+        self._chat_llm = llm
+        self._verbose = verbose
+
         if student_summary is None:
             student_summary = ""
         self._student_summary = student_summary
 
+        self._prompt_template = prompt
         self._prompt = self._create_prompt(prompt_template=prompt)
-        self._memory = self._configure_memory()
+
+        if memory is None:
+            memory = self._configure_memory()
+        self._memory = memory
 
         self._chain = self._create_llm_chain()
 
@@ -48,7 +64,7 @@ class CourseAssistant:
         return LLMChain(llm=self._chat_llm,
                         prompt=self._prompt,
                         memory=self._memory,
-                        verbose=True,
+                        verbose=self._verbose,
                         )
 
     def _create_prompt(self, prompt_template: str):
@@ -58,9 +74,10 @@ class CourseAssistant:
         self._system_message_prompt.prompt = self._system_message_prompt.prompt.partial(
             student_summary=self._student_summary)
 
-        human_template = "{human_input}"
+        # the chat history goes in the human message (rather than the system message) so the system prompt is an
+        # identical prefix on every turn, which lets the provider's prompt caching kick in
         human_message_prompt = HumanMessagePromptTemplate.from_template(
-            human_template
+            COURSE_ASSISTANT_HUMAN_INPUT_TEMPLATE
         )
 
         chat_prompt = ChatPromptTemplate.from_messages(
@@ -72,7 +89,22 @@ class CourseAssistant:
     async def async_process_input(self, input_text):
         print(f"Input: {input_text}")
         print("Streaming response...\n")
+
+        if not self._deterministic:
+            return await self._chain.arun(human_input=input_text)
+
+        cache_key = ExactResponseCache.make_key(self._chat_llm.model_name,
+                                                self._prompt_template,
+                                                self._student_summary,
+                                                str(self._memory.load_memory_variables({})),
+                                                input_text)
+        ai_response = _deterministic_response_cache.get(cache_key)
+        if ai_response is not None:
+            self._memory.save_context({"human_input": input_text}, {"text": ai_response})
+            return ai_response
+
         ai_response = await self._chain.arun(human_input=input_text)
+        _deterministic_response_cache.put(cache_key, ai_response)
         return ai_response
 
     async def demo(self):
@@ -81,7 +113,7 @@ class CourseAssistant:
         print("Type 'exit' to end the demo.\n")
 
         while True:
-            input_text = input("Enter your input: ")
+            input_text = await asyncio.to_thread(input, "Enter your input: ")
 
             if input_text.strip().lower() == "exit":
                 print("Ending the demo. Goodbye!")
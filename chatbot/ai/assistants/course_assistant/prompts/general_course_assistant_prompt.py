@@ -67,9 +67,12 @@ GENERAL_COURSE_ASSISTANT_SYSTEM_TEMPLATE = """
     - Let the student lead the conversation                                
             
     DO NOT MAKE STUFF UP!! IF YOU ARE ASKED A QUESTION YOU DO NOT KNOW THE ANSWER TO SAY "I DON'T KNOW" OR SOMETHING SIMILAR. DO NOT MAKE THINGS UP!
-
-    ----
-    Current Chat History: 
-    {chat_history}
     """
 
+COURSE_ASSISTANT_HUMAN_INPUT_TEMPLATE = """
+Current Chat History: 
+{chat_history}
+
+{human_input}
+"""
+
@@ -90,11 +90,6 @@ Your conversational style is:
 - You speak in a casual and friendly manner.
 - Use your own words and be yourself!
 - GIVE SHORT ANSWERS                          
-
-
-----
-Current Chat History: 
-{chat_history}
 """
 
 ###########################################################
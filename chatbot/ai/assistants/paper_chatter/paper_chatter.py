@@ -2,11 +2,11 @@ import asyncio
 
 from dotenv import load_dotenv
 
+from chatbot.ai.callbacks.batching_stdout_handler import BatchingStdOutHandler
 from chatbot.ai.assistants.paper_chatter.paper_chatter_prompt import PAPER_CHATTER_SYSTEM_TEMPLATE
 
 load_dotenv()
 from langchain import LLMChain, OpenAI
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 from langchain.chat_models import ChatOpenAI
 from langchain.memory import ConversationSummaryBufferMemory, VectorStoreRetrieverMemory, CombinedMemory
 from langchain.prompts import (
@@ -32,7 +32,7 @@ class PaperChatter:
                      prompt_template=PAPER_CHATTER_SYSTEM_TEMPLATE):
         chat_llm = ChatOpenAI(
             streaming=True,
-            callbacks=[StreamingStdOutCallbackHandler()],
+            callbacks=[BatchingStdOutHandler()],
             temperature=temperature,
             model_name=model_name,
         )
@@ -102,7 +102,7 @@ class PaperChatter:
         print("Type 'exit' to end the demo.\n")
 
         while True:
-            input_text = input("Enter your input: ")
+            input_text = await asyncio.to_thread(input, "Enter your input: ")
 
             if input_text.strip().lower() == "exit":
                 print("Ending the demo. Goodbye!")
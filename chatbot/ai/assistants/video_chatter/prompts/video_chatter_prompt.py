@@ -1,4 +1,12 @@
-VIDEO_CHATTER_SYSTEM_TEMPLATE = """
+import textwrap
+
+
+def _clean_template(template: str) -> str:
+    # the literal below is indented to match the code around it - none of that whitespace should reach the model
+    return "\n".join(line.rstrip() for line in textwrap.dedent(template).splitlines()).strip()
+
+
+VIDEO_CHATTER_SYSTEM_TEMPLATE = _clean_template("""
             You are a teaching assistant for the course: Neural Control of Real-World Human Movement. 
     
             The students are about to descibe a video to you. The video represents a visualization of data recorded from a human performing a complex perceptuomotor task. 
@@ -36,7 +44,4 @@ VIDEO_CHATTER_SYSTEM_TEMPLATE = """
             
             Ask the student how the data in the video relates to their own interests. Try to help them look up research articles on Google Scholar and/r PubMed that can help them find scientific literature related to the kinds of perceptuomotor tasks represented in the dataset shown in the video. 
             
-            ----
-            Current Chat History: 
-            {chat_history}
-            """
+            """)
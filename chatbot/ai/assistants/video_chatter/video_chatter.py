@@ -1,18 +1,65 @@
 import asyncio
+import functools
+import logging
+import sys
+from typing import List
 
-from dotenv import load_dotenv
-
-from chatbot.ai.assistants.video_chatter.prompts.video_chatter_prompt import VIDEO_CHATTER_SYSTEM_TEMPLATE
-
-load_dotenv()
 from langchain import LLMChain, OpenAI
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 from langchain.chat_models import ChatOpenAI
-from langchain.memory import ConversationSummaryBufferMemory
 from langchain.prompts import (
     HumanMessagePromptTemplate,
-    ChatPromptTemplate, SystemMessagePromptTemplate,
+    ChatPromptTemplate, SystemMessagePromptTemplate, MessagesPlaceholder,
 )
+from langchain.schema import get_buffer_string, messages_to_dict, messages_from_dict
+
+from chatbot.ai.assistants.video_chatter.prompts.video_chatter_prompt import VIDEO_CHATTER_SYSTEM_TEMPLATE
+from chatbot.ai.chat_llm import create_chat_llm
+from chatbot.ai.exact_response_cache import ExactResponseCache
+from chatbot.ai.memory.background_summary_buffer_memory import BackgroundSummaryBufferMemory
+from chatbot.ai.vector_embeddings.semantic_cache import SemanticCache
+from chatbot.system.environment_variables import get_openai_api_key
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_REQUESTS = 8
+ESCALATION_WORD_COUNT = 20
+# semantic cache entries are keyed on the whole chat history, so only turns that follow at most the opening exchange
+# can ever be matched again - later turns aren't worth an embedding call and a Mongo write
+SEMANTIC_CACHE_MAX_HISTORY_MESSAGES = 2
+
+# shared by every VideoChatter (e.g. the opening turn of each new thread is always the same)
+_exact_response_cache = ExactResponseCache()
+
+
+# a VideoChatter is created for every thread, so the llm clients and the prompt are built once and shared between them
+@functools.lru_cache(maxsize=8)
+def _get_chat_llm(model_name: str, temperature: float) -> ChatOpenAI:
+    return create_chat_llm(temperature=temperature, model_name=model_name)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_memory_llm() -> OpenAI:
+    return OpenAI(temperature=0, openai_api_key=get_openai_api_key())
+
+
+@functools.lru_cache(maxsize=8)
+def _get_chat_prompt(prompt_template: str) -> ChatPromptTemplate:
+    system_message_prompt = SystemMessagePromptTemplate.from_template(
+        prompt_template
+    )
+
+    human_template = "{human_input}"
+    human_message_prompt = HumanMessagePromptTemplate.from_template(
+        human_template
+    )
+
+    # the system message has no variables, so it is a byte-identical prefix on every turn (which is what the
+    # provider's prompt caching keys on) - the chat history follows it as regular messages
+    return ChatPromptTemplate.from_messages(
+        [system_message_prompt,
+         MessagesPlaceholder(variable_name="chat_history"),
+         human_message_prompt]
+    )
 
 
 class VideoChatter:
@@ -20,69 +67,207 @@ class VideoChatter:
                  temperature=0.8,
                  model_name="gpt-4",
                  prompt: str = VIDEO_CHATTER_SYSTEM_TEMPLATE,
+                 semantic_cache: SemanticCache = None,
+                 verbose: bool = False,
+                 cheap_model_name: str = None,
+                 use_exact_cache: bool = False,
                  ):
-        self._chat_llm = ChatOpenAI(
-            streaming=True,
-            callbacks=[StreamingStdOutCallbackHandler()],
-            temperature=temperature,
-            model_name=model_name,
-        )
-
-        self._prompt = self._create_prompt(prompt_template=prompt)
+        self._chat_llm = _get_chat_llm(model_name=model_name, temperature=temperature)
+        # verbose chains print the whole formatted prompt on every turn, so leave it off outside of debugging
+        self._verbose = verbose
+        self._prompt = _get_chat_prompt(prompt_template=prompt)
         self._memory = self._configure_memory()
 
         self._chain = self._create_llm_chain()
+        self._semantic_cache = semantic_cache
+        self._use_exact_cache = use_exact_cache
+        self._compaction_task: asyncio.Task = None
+        self._cache_insert_tasks = set()
 
+        # when a cheap model is given, routine turns go to it and only the ones that need it go to `model_name`
+        self._cheap_chain = None
+        if cheap_model_name is not None:
+            self._cheap_chain = self._create_llm_chain(
+                llm=_get_chat_llm(model_name=cheap_model_name, temperature=temperature))
 
     def _configure_memory(self):
 
-        return ConversationSummaryBufferMemory(memory_key="chat_history",
-                                               llm=OpenAI(temperature=0),
-                                               max_token_limit=1000)
+        return BackgroundSummaryBufferMemory(memory_key="chat_history",
+                                             llm=_get_memory_llm(),
+                                             max_token_limit=1000,
+                                             return_messages=True)
 
-    def _create_llm_chain(self):
-        return LLMChain(llm=self._chat_llm,
+    def _create_llm_chain(self, llm: ChatOpenAI = None):
+        if llm is None:
+            llm = self._chat_llm
+        return LLMChain(llm=llm,
                         prompt=self._prompt,
                         memory=self._memory,
-                        verbose=True,
+                        verbose=self._verbose,
                         )
 
-    def _create_prompt(self, prompt_template: str):
-        self._system_message_prompt = SystemMessagePromptTemplate.from_template(
-            prompt_template
-        )
+    async def async_process_input(self, input_text):
+        print(f"Input: {input_text}")
+        print("Streaming response...\n")
 
-        human_template = "{human_input}"
-        human_message_prompt = HumanMessagePromptTemplate.from_template(
-            human_template
-        )
+        ai_response = await self._aget_response(input_text)
+        self._schedule_memory_compaction()
+        return ai_response
 
-        chat_prompt = ChatPromptTemplate.from_messages(
-            [self._system_message_prompt, human_message_prompt]
-        )
+    async def _aget_response(self, input_text: str) -> str:
+        chain = self._select_chain(input_text)
 
-        return chat_prompt
+        if self._semantic_cache is None and not self._use_exact_cache:
+            return await chain.arun(human_input=input_text)
 
-    async def async_process_input(self, input_text):
-        print(f"Input: {input_text}")
-        print("Streaming response...\n")
-        ai_response = await self._chain.arun(human_input=input_text)
+        # only reuse a response that was given at the same point in a conversation
+        chat_history = self._get_chat_history_string()
+
+        exact_key = ExactResponseCache.make_key(chat_history, input_text)
+        if self._use_exact_cache:
+            cached_response = _exact_response_cache.get(exact_key)
+            if cached_response is not None:
+                return self._use_cached_response(input_text, cached_response)
+
+        use_semantic_cache = self._semantic_cache is not None and self._is_opening_turn()
+        if use_semantic_cache:
+            try:
+                cached = await self._semantic_cache.lookup(input_text, context=chat_history)
+            except Exception as e:
+                logger.error(f"Semantic cache lookup failed: {e}")
+                cached = None
+            if cached is not None:
+                return self._use_cached_response(input_text, cached["response"])
+
+        ai_response = await chain.arun(human_input=input_text)
+
+        if self._use_exact_cache:
+            _exact_response_cache.put(exact_key, ai_response)
+        if use_semantic_cache:
+            # the embedding and the Mongo write happen after the reply has gone out, not before
+            insert_task = asyncio.create_task(self._insert_into_semantic_cache(input_text, ai_response, chat_history))
+            self._cache_insert_tasks.add(insert_task)
+            insert_task.add_done_callback(self._cache_insert_tasks.discard)
+        return ai_response
+
+    def _is_opening_turn(self) -> bool:
+        return (not self._memory.moving_summary_buffer
+                and len(self._memory.chat_memory.messages) <= SEMANTIC_CACHE_MAX_HISTORY_MESSAGES)
+
+    async def _insert_into_semantic_cache(self, input_text: str, ai_response: str, chat_history: str):
+        try:
+            await self._semantic_cache.insert(input_text, {"response": ai_response}, context=chat_history)
+        except Exception as e:
+            logger.error(f"Semantic cache insert failed: {e}")
+
+    def _schedule_memory_compaction(self):
+        # summarizing the overflow takes an LLM call, so it runs after the turn rather than inside it
+        if self._compaction_task is None or self._compaction_task.done():
+            self._compaction_task = asyncio.create_task(self._compact_memory())
+
+    async def _compact_memory(self):
+        try:
+            await self._memory.acompact()
+        except Exception as e:
+            logger.error(f"Failed to compact VideoChatter memory: {e}")
+
+    def _use_cached_response(self, input_text: str, ai_response: str) -> str:
+        self._memory.save_context({"human_input": input_text}, {"text": ai_response})
         return ai_response
 
+    def _select_chain(self, input_text: str) -> LLMChain:
+        if self._cheap_chain is None or self._should_escalate(input_text):
+            return self._chain
+        return self._cheap_chain
+
+    @staticmethod
+    def _should_escalate(input_text: str) -> bool:
+        # short replies ("yeah", "it's someone juggling") are fine on the cheap model, but questions and longer
+        # explanations of the video are where the bigger model earns its cost
+        return "?" in input_text or len(input_text.split()) >= ESCALATION_WORD_COUNT
+
+    async def async_process_batch(self,
+                                  input_texts: List[str],
+                                  max_concurrent_requests: int = MAX_CONCURRENT_REQUESTS) -> List[str]:
+        """
+        Run each input as the start of its own, separate conversation (e.g. one per student), with up to
+        `max_concurrent_requests` of them in flight at once. This chatter's own memory is left untouched.
+        """
+        # concurrent streams would interleave on stdout, so the batch uses a non-streaming copy of the llm
+        batch_llm = self._chat_llm.copy(update={"streaming": False, "callbacks": None})
+        semaphore = asyncio.Semaphore(max_concurrent_requests)
+
+        async def _process(input_text: str) -> str:
+            chain = LLMChain(llm=batch_llm,
+                             prompt=self._prompt,
+                             memory=self._configure_memory(),
+                             )
+            async with semaphore:
+                return await chain.arun(human_input=input_text)
+
+        return await asyncio.gather(*[_process(input_text) for input_text in input_texts])
+
+    def _get_chat_history_string(self) -> str:
+        return self._memory.moving_summary_buffer + "\n" + get_buffer_string(self._memory.chat_memory.messages)
+
     async def demo(self):
         print("Welcome to the Neural Control Assistant demo!")
-        print("Type 'exit' to end the demo.\n")
+        print("Finish each input with an empty line. Type 'exit' to end the demo.\n")
+
+        # a response is requested as soon as each line is entered, so the model is already working while the next
+        # line is being typed - it only gets used (and saved to memory) once the input is finished with an empty line
+        speculative_chain = LLMChain(llm=self._chat_llm.copy(update={"streaming": False, "callbacks": None}),
+                                     prompt=self._prompt,
+                                     )
+        lines = []
+        pending_response = None
 
         while True:
-            input_text = input("Enter your input: ")
+            line = await asyncio.to_thread(sys.stdin.readline)
 
-            if input_text.strip().lower() == "exit":
+            if not line or line.strip().lower() == "exit":
+                if pending_response is not None:
+                    pending_response.cancel()
                 print("Ending the demo. Goodbye!")
                 break
 
-            response = await self.async_process_input(input_text)
+            if line.strip():
+                lines.append(line.rstrip("\n"))
+                if pending_response is not None:
+                    pending_response.cancel()
+                pending_response = asyncio.create_task(
+                    speculative_chain.arun(human_input="\n".join(lines),
+                                           **self._memory.load_memory_variables({})))
+                continue
+
+            if pending_response is None:
+                continue
+
+            input_text = "\n".join(lines)
+            response = await pending_response
+            self._memory.save_context({"human_input": input_text}, {"text": response})
+            self._schedule_memory_compaction()
+            print(f"{response}\n")
+
+            lines = []
+            pending_response = None
+
+    def dump_state(self) -> dict:
+        """
+        The conversation memory as a JSON/BSON-serializable dict, so it can be stored (e.g. in Mongo) and restored
+        with `load_state` by a VideoChatter in another process.
+        """
+        return {"moving_summary_buffer": self._memory.moving_summary_buffer,
+                "messages": messages_to_dict(self._memory.chat_memory.messages),
+                }
 
-            print("\n")
+    def load_state(self, state: dict):
+        # an in-flight compaction is summarizing the history that's about to be replaced
+        if self._compaction_task is not None:
+            self._compaction_task.cancel()
+            self._compaction_task = None
+        self._memory.moving_summary_buffer = state["moving_summary_buffer"]
+        self._memory.chat_memory.messages = messages_from_dict(state["messages"])
 
     async def load_memory_from_thread(self, thread, bot_name: str):
         async for message in thread.history(limit=None, oldest_first=True):
@@ -92,6 +277,7 @@ class VideoChatter:
                 self._memory.chat_memory.add_ai_message(message.content)
             else:
                 self._memory.chat_memory.add_user_message(message.content)
+        self._schedule_memory_compaction()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,45 @@
+import sys
+import time
+from typing import Any, List
+
+from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
+from langchain.schema import LLMResult
+
+DEFAULT_MAX_BUFFERED_TOKENS = 16
+DEFAULT_MAX_BUFFER_SECONDS = 0.03
+
+
+class BatchingStdOutHandler(StreamingStdOutCallbackHandler):
+    """
+    Streams tokens to stdout like `StreamingStdOutCallbackHandler`, but buffers them and writes in chunks
+    (every `max_buffered_tokens` tokens or `max_buffer_seconds`, whichever comes first) instead of once per token.
+    """
+
+    def __init__(self,
+                 max_buffered_tokens: int = DEFAULT_MAX_BUFFERED_TOKENS,
+                 max_buffer_seconds: float = DEFAULT_MAX_BUFFER_SECONDS,
+                 ):
+        super().__init__()
+        self._max_buffered_tokens = max_buffered_tokens
+        self._max_buffer_seconds = max_buffer_seconds
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self._buffer.append(token)
+        if (len(self._buffer) >= self._max_buffered_tokens
+                or time.monotonic() - self._last_flush > self._max_buffer_seconds):
+            self.flush()
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        self.flush()
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        self.flush()
+
+    def flush(self):
+        if self._buffer:
+            sys.stdout.write("".join(self._buffer))
+            sys.stdout.flush()
+            self._buffer.clear()
+        self._last_flush = time.monotonic()
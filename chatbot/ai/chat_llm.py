@@ -0,0 +1,16 @@
+from langchain.chat_models import ChatOpenAI
+
+from chatbot.ai.callbacks.batching_stdout_handler import BatchingStdOutHandler
+from chatbot.system.environment_variables import get_openai_api_key
+
+
+def create_chat_llm(temperature=0.8,
+                    model_name="gpt-4",
+                    ) -> ChatOpenAI:
+    return ChatOpenAI(
+        streaming=True,
+        callbacks=[BatchingStdOutHandler()],
+        temperature=temperature,
+        model_name=model_name,
+        openai_api_key=get_openai_api_key(),
+    )
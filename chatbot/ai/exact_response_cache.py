@@ -0,0 +1,33 @@
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+DEFAULT_MAX_ENTRIES = 1024
+
+
+class ExactResponseCache:
+    """
+    An in-memory LRU of LLM responses, keyed on a hash of exactly what produced them (prompt, chat history, input...).
+
+    There are no embeddings involved, so a lookup costs a hash - it only ever matches byte-identical inputs.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._responses: "OrderedDict[bytes, str]" = OrderedDict()
+
+    @staticmethod
+    def make_key(*parts: str) -> bytes:
+        return hashlib.blake2b("\x00".join(parts).encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[str]:
+        response = self._responses.get(key)
+        if response is not None:
+            self._responses.move_to_end(key)
+        return response
+
+    def put(self, key: bytes, response: str):
+        self._responses[key] = response
+        self._responses.move_to_end(key)
+        if len(self._responses) > self._max_entries:
+            self._responses.popitem(last=False)
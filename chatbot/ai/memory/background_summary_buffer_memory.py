@@ -0,0 +1,39 @@
+from langchain import LLMChain
+from langchain.memory import ConversationSummaryBufferMemory
+from langchain.schema import get_buffer_string
+
+
+class BackgroundSummaryBufferMemory(ConversationSummaryBufferMemory):
+    """
+    A `ConversationSummaryBufferMemory` that doesn't summarize inside `save_context`, where the (blocking) summary
+    call lands on the turn that happens to overflow the buffer. Call `acompact` after the turn instead, e.g. from a
+    background task, so the next turn already sees the smaller buffer.
+    """
+
+    def prune(self) -> None:
+        pass
+
+    async def acompact(self) -> None:
+        buffer = self.chat_memory.messages
+        pruned_count = 0
+        while (pruned_count < len(buffer)
+               and self.llm.get_num_tokens_from_messages(buffer[pruned_count:]) > self.max_token_limit):
+            pruned_count += 1
+
+        if pruned_count == 0:
+            return
+
+        summary_chain = LLMChain(llm=self.llm, prompt=self.prompt)
+        new_summary = await summary_chain.apredict(summary=self.moving_summary_buffer,
+                                                   new_lines=get_buffer_string(buffer[:pruned_count],
+                                                                               human_prefix=self.human_prefix,
+                                                                               ai_prefix=self.ai_prefix))
+
+        if self.chat_memory.messages is not buffer:
+            # the history was replaced while the summary was being written, so this summary belongs to another one
+            return
+
+        # messages are only ever appended while the summary is being written, so the oldest `pruned_count` are
+        # still exactly the ones that were summarized
+        del buffer[:pruned_count]
+        self.moving_summary_buffer = new_summary
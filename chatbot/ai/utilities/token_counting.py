@@ -0,0 +1,37 @@
+import functools
+import os
+from typing import List
+
+import tiktoken
+
+
+@functools.lru_cache(maxsize=8)
+def _get_encoding(model: str) -> tiktoken.Encoding:
+    return tiktoken.encoding_for_model(model)
+
+
+def num_tokens_from_string(string: str, model: str) -> int:
+    """Returns the number of tokens in a text string."""
+    return len(_get_encoding(model).encode(string, disallowed_special=()))
+
+
+def num_tokens_from_strings(strings: List[str], model: str) -> List[int]:
+    """Returns the number of tokens in each of a list of text strings, encoded in parallel."""
+    encoded_strings = _get_encoding(model).encode_batch(strings,
+                                                        num_threads=os.cpu_count() or 8,
+                                                        disallowed_special=())
+    return [len(tokens) for tokens in encoded_strings]
+
+
+def trim_text_to_token_limit(string: str,
+                             model: str,
+                             head_tokens: int,
+                             tail_tokens: int,
+                             separator: str = "\n...\n") -> str:
+    """Keeps the first `head_tokens` and last `tail_tokens` tokens of a text string if it is longer than both combined."""
+    encoding = _get_encoding(model)
+    tokens = encoding.encode(string, disallowed_special=())
+    if len(tokens) <= head_tokens + tail_tokens:
+        return string
+
+    return encoding.decode(tokens[:head_tokens]) + separator + encoding.decode(tokens[-tail_tokens:])
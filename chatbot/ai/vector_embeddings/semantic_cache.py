@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional, List
+
+import numpy as np
+from bson import Binary
+from langchain.embeddings import OpenAIEmbeddings
+from langchain.embeddings.base import Embeddings
+
+from chatbot.mongo_database.mongo_database_manager import MongoDatabaseManager
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+EMPTY_CONTEXT_HASH = hash_text("")
+INITIAL_MATRIX_CAPACITY = 64
+# a miss that never gets its `insert` (the caller failed) leaves its embedding behind, so only the most recent are kept
+MAX_PENDING_EMBEDDINGS = 256
+
+
+class SemanticCache:
+    """
+    Caches LLM outputs (as dicts) keyed on the input text.
+
+    Lookups try an exact SHA256 match on the normalized text first, then fall back to cosine similarity against the
+    embeddings of everything cached so far. Entries are persisted to Mongo so they survive between runs.
+
+    An optional `context` (e.g. the chat history that preceded the input) restricts matches to entries that were
+    cached with the exact same context.
+    """
+
+    def __init__(self,
+                 mongo_database: MongoDatabaseManager,
+                 collection_name: str,
+                 similarity_threshold: float = 0.97,
+                 embedding_model: str = "text-embedding-ada-002",
+                 embeddings: Embeddings = None,
+                 ):
+        self._collection = mongo_database.get_collection(collection_name)
+        # ada-002 similarities bunch up near 1.0 (unrelated texts still score ~0.7), so the threshold sits high
+        self._similarity_threshold = similarity_threshold
+        if embeddings is None:
+            # `deployment` (not `model`) is what OpenAIEmbeddings actually sends as the engine
+            embeddings = OpenAIEmbeddings(model=embedding_model, deployment=embedding_model)
+        self._embeddings_model = embeddings
+
+        self._exact_cache = {}
+        # grown by doubling, so only the first `len(self._cached_values)` rows are filled in
+        self._embedding_matrix = None
+        self._cached_values: List[dict] = []
+        self._context_hashes: List[str] = []
+        self._known_context_hashes = set()
+        self._pending_embeddings: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    async def load(self):
+        async with self._load_lock:
+            if self._loaded:
+                return
+
+            embeddings = []
+            async for document in self._collection.find():
+                context_hash = document.get("context_hash", EMPTY_CONTEXT_HASH)
+                self._exact_cache[(context_hash, document["input_hash"])] = document["value"]
+                embeddings.append(np.frombuffer(document["embedding"], dtype=np.float32))
+                self._cached_values.append(document["value"])
+                self._context_hashes.append(context_hash)
+                self._known_context_hashes.add(context_hash)
+
+            if embeddings:
+                self._embedding_matrix = np.vstack(embeddings)
+            self._loaded = True
+            logger.info(f"Loaded {len(self._cached_values)} entries into the semantic cache")
+
+    async def lookup(self, input_text: str, context: str = "") -> Optional[dict]:
+        await self.load()
+
+        key = (hash_text(context), hash_text(input_text))
+        if key in self._exact_cache:
+            logger.info(f"Semantic cache exact hit for hash {key[1][:8]}")
+            return self._exact_cache[key]
+
+        # nothing was cached with this context, so no similarity match is possible - skip paying for the embedding
+        if key[0] not in self._known_context_hashes:
+            return None
+
+        embedding = await self._embed(input_text)
+        similarities = embedding @ self._embedding_matrix[:len(self._cached_values)].T
+        similarities[np.asarray(self._context_hashes) != key[0]] = -np.inf
+        best_index = int(np.argmax(similarities))
+        if similarities[best_index] > self._similarity_threshold:
+            logger.info(f"Semantic cache similarity hit (cosine={similarities[best_index]:.3f})")
+            return self._cached_values[best_index]
+
+        # hold on to the embedding so the `insert` that follows a miss doesn't pay for it twice
+        self._pending_embeddings[key] = embedding
+        if len(self._pending_embeddings) > MAX_PENDING_EMBEDDINGS:
+            self._pending_embeddings.popitem(last=False)
+        return None
+
+    async def insert(self, input_text: str, value: dict, context: str = ""):
+        await self.load()
+
+        context_hash, input_hash = key = (hash_text(context), hash_text(input_text))
+        embedding = self._pending_embeddings.pop(key, None)
+        if embedding is None:
+            embedding = await self._embed(input_text)
+
+        await self._collection.update_one({"input_hash": input_hash,
+                                           "context_hash": context_hash},
+                                          {"$set": {"input_hash": input_hash,
+                                                    "context_hash": context_hash,
+                                                    "embedding": Binary(embedding.tobytes()),
+                                                    "value": value,
+                                                    }},
+                                          upsert=True)
+
+        self._append_embedding(embedding)
+        self._exact_cache[key] = value
+        self._cached_values.append(value)
+        self._context_hashes.append(context_hash)
+        self._known_context_hashes.add(context_hash)
+
+    def _append_embedding(self, embedding: np.ndarray):
+        row = len(self._cached_values)
+        if self._embedding_matrix is None:
+            self._embedding_matrix = np.empty((INITIAL_MATRIX_CAPACITY, embedding.shape[0]), dtype=np.float32)
+        elif row == self._embedding_matrix.shape[0]:
+            grown_matrix = np.empty((2 * row, embedding.shape[0]), dtype=np.float32)
+            grown_matrix[:row] = self._embedding_matrix
+            self._embedding_matrix = grown_matrix
+        self._embedding_matrix[row] = embedding
+
+    async def _embed(self, input_text: str) -> np.ndarray:
+        # the pinned langchain has no async embeddings, so keep the blocking request off the event loop
+        embedding = np.asarray(await asyncio.to_thread(self._embeddings_model.embed_query, normalize_text(input_text)),
+                               dtype=np.float32)
+        # unit-normalize so the dot product against the matrix is the cosine similarity
+        return embedding / np.linalg.norm(embedding)
@@ -2,14 +2,13 @@ import logging
 import os
 from datetime import datetime
 
-import tiktoken
 from dotenv import load_dotenv
 from langchain import LLMChain
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 from langchain.chat_models import ChatOpenAI, ChatAnthropic
 from langchain.memory import ConversationBufferMemory
 from langchain.prompts import HumanMessagePromptTemplate, ChatPromptTemplate, SystemMessagePromptTemplate
 
+from chatbot.ai.callbacks.batching_stdout_handler import BatchingStdOutHandler
 from chatbot.ai.workers.class_summary_builder.class_summary_builder_prompts import \
     CLASS_SUMMARY_BUILDER_PROMPT_SYSTEM_TEMPLATE, CLASS_SUMMARY_NEW_SUMMARY_HUMAN_INPUT_PROMPT
 
@@ -37,7 +36,7 @@ class ClassSummaryBuilder:
         else:
             self.llm = ChatOpenAI(model_name='gpt-4',
                                   temperature=0,
-                                  callbacks=[StreamingStdOutCallbackHandler()],
+                                  callbacks=[BatchingStdOutHandler()],
                                   streaming=True,
                                   max_tokens=4000,
                                   )
@@ -84,11 +83,3 @@ def time_since_last_summary(class_summary_entry):
     time_since_last_summary = current_time - previous_summary_datetime
     time_since_last_summary_in_hours = time_since_last_summary.total_seconds() / 3600
     return time_since_last_summary_in_hours
-
-
-def num_tokens_from_string(string: str, model: str) -> int:
-    """Returns the number of tokens in a text string."""
-    encoding = tiktoken.encoding_for_model(model)
-    num_tokens = len(encoding.encode(string))
-    return num_tokens
-
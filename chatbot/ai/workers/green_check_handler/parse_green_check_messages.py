@@ -1,23 +1,36 @@
+import asyncio
 import logging
-import os
 import random
 from pathlib import Path
-from typing import Union
-
-from dotenv import load_dotenv
+from typing import Union, List, Set, Optional
 
 from langchain import PromptTemplate, OpenAI
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 from langchain.output_parsers import PydanticOutputParser
-from pydantic import BaseModel, Field
+from langchain.schema import OutputParserException
+from pydantic import BaseModel, Field, PrivateAttr
+from pymongo import UpdateOne
 
+from chatbot.ai.utilities.token_counting import trim_text_to_token_limit
+from chatbot.ai.vector_embeddings.semantic_cache import SemanticCache
 from chatbot.ai.workers.green_check_handler.grab_green_check_messages import grab_green_check_messages
 from chatbot.mongo_database.mongo_database_manager import MongoDatabaseManager
 from chatbot.student_info.find_student_name import get_initials
+from chatbot.system.environment_variables import get_openai_api_key, get_course_dropbox_folder_path
+from chatbot.system.filenames_and_paths import GREEN_CHECK_CACHE_COLLECTION_NAME
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MAX_COMPLETION_TOKENS = 1500
+# text-davinci-003 has a 4097 token context, shared with the format instructions and the completion, so long
+# inputs are cut down to their beginning and end
+INPUT_HEAD_TOKENS = 1000
+INPUT_TAIL_TOKENS = 800
+
+_COURSE_DROPBOX_FOLDER_PATH = get_course_dropbox_folder_path()
+# directories already created by `_write_file`, so each one is only mkdir'd once per process
+_MADE_DIRS: Set[Path] = set()
+
 
 class PaperSummary(BaseModel):
     title: str = Field("", description="The title of the research article")
@@ -32,9 +45,20 @@ class PaperSummary(BaseModel):
     tags: str = Field("", description="A list of tags formatted using #kebab-case-lowercase")
     summary_title: str = Field("", description="A summary title made by combining the `author_year` field with the `extremely_short_summary` field, like this: ['author_year'] - ['extremely_short_summary']")
 
+    _rendered: str = PrivateAttr(default=None)
+
+    class Config:
+        # `__str__` caches the rendered markdown, so the fields must not change after it has been rendered
+        allow_mutation = False
 
     def __str__(self):
-        tags = "\n".join(self.tags.split(" "))
+        # rendered once and reused - the markdown is written to both mongo and disk for every entry
+        if self._rendered is None:
+            self._rendered = self._render()
+        return self._rendered
+
+    def _render(self) -> str:
+        tags = self.tags.replace(" ", "\n")
         return f"""
 # {self.summary_title}\n
 ## Title\n
@@ -57,17 +81,22 @@ class PaperSummary(BaseModel):
 {tags}
 """
 
+_PAPER_PARSER = PydanticOutputParser(pydantic_object=PaperSummary)
+_PAPER_FORMAT_INSTRUCTIONS = _PAPER_PARSER.get_format_instructions()
+
+
 class GreenCheckMessageParser:
-    def __init__(self):
-        load_dotenv()
+    def __init__(self, cache: SemanticCache = None):
+        self._cache = cache
+        # `max_tokens=-1` is only allowed for single prompts, so batched calls need an explicit completion budget
         self._llm = OpenAI(model_name="text-davinci-003",
                            temperature=0,
-                            max_tokens=-1,
-                           streaming=True,
-                           callbacks=[StreamingStdOutCallbackHandler()],
+                           max_tokens=MAX_COMPLETION_TOKENS,
+                           max_retries=6,
+                           openai_api_key=get_openai_api_key(),
                            )
 
-        self._parser = PydanticOutputParser(pydantic_object=PaperSummary)
+        self._parser = _PAPER_PARSER
 
         self._prompt_template = PromptTemplate(
             template="Use these instructions to convert the input text into a paper summary:\n "
@@ -80,98 +109,210 @@ class GreenCheckMessageParser:
                      "IF YOU DO NOT HAVE ENOUGH INFORMATION TO FILL OUT A FIELD SAY 'COULD NOT FIND IN INPUT TEXT'",
 
             input_variables=["input_text"],
-            partial_variables={"format_instructions": self._parser.get_format_instructions()}
+            partial_variables={"format_instructions": _PAPER_FORMAT_INSTRUCTIONS}
         )
 
+    def _format_prompt(self, input_text: str) -> str:
+        input_text = trim_text_to_token_limit(input_text,
+                                              model=self._llm.model_name,
+                                              head_tokens=INPUT_HEAD_TOKENS,
+                                              tail_tokens=INPUT_TAIL_TOKENS)
+        return self._prompt_template.format_prompt(input_text=input_text).to_string()
+
     def parse_input(self, input_text: str) -> PaperSummary:
-        _input_text = self._prompt_template.format_prompt(input_text=input_text)
-        _output = self._llm(_input_text.to_string())
+        _output = self._llm(self._format_prompt(input_text))
         response = self._parser.parse(_output)
         return response
 
-    async def aparse_input(self, input_text: str) -> PaperSummary:
-        response = self.parse_input(input_text=input_text)
-        return response
+    def parse_batch(self, texts: List[str]) -> List[Optional[PaperSummary]]:
+        result = self._llm.generate([self._format_prompt(text) for text in texts])
+        return [self._parse_generation(generation[0].text) for generation in result.generations]
+
+    def _parse_generation(self, output: str) -> Optional[PaperSummary]:
+        # one malformed completion shouldn't throw away the rest of its batch
+        try:
+            return self._parser.parse(output)
+        except OutputParserException as e:
+            logger.error(f"Failed to parse green check output: {e}")
+            return None
+
+    async def aparse_input(self, input_text: str) -> Optional[PaperSummary]:
+        responses = await self.aparse_batch([input_text])
+        return responses[0]
+
+    # the completions are already paid for by the time the cache is touched, so a cache (embedding or Mongo) error is
+    # logged and treated as a miss rather than losing the batch
+    async def _lookup_cached_output(self, text: str) -> Optional[dict]:
+        try:
+            return await self._cache.lookup(text)
+        except Exception as e:
+            logger.error(f"Green check cache lookup failed: {e}")
+            return None
+
+    async def _insert_cached_output(self, text: str, response: PaperSummary):
+        try:
+            await self._cache.insert(text, response.dict())
+        except Exception as e:
+            logger.error(f"Green check cache insert failed: {e}")
+
+    async def aparse_batch(self, texts: List[str]) -> List[Optional[PaperSummary]]:
+        """Entries whose output couldn't be parsed come back as None."""
+        responses = [None] * len(texts)
+
+        if self._cache is not None:
+            cached_outputs = await asyncio.gather(*[self._lookup_cached_output(text) for text in texts])
+            for index, cached_output in enumerate(cached_outputs):
+                if cached_output is not None:
+                    # cached outputs were validated when they were first parsed, so skip re-validating them
+                    responses[index] = PaperSummary.construct(**cached_output)
+
+        uncached_indices = [index for index, response in enumerate(responses) if response is None]
+        if not uncached_indices:
+            return responses
+
+        result = await self._llm.agenerate([self._format_prompt(texts[index]) for index in uncached_indices])
+        for index, generation in zip(uncached_indices, result.generations):
+            responses[index] = self._parse_generation(generation[0].text)
+
+        if self._cache is not None:
+            await asyncio.gather(*[self._insert_cached_output(texts[index], responses[index])
+                                   for index in uncached_indices
+                                   if responses[index] is not None])
+        return responses
 
 async def parse_green_check_messages(overwrite: bool = False,
                                      save_to_json: bool = True,
-                                     collection_name: str = "green_check_messages"):
-
-    parser = GreenCheckMessageParser()
+                                     collection_name: str = "green_check_messages",
+                                     use_cache: bool = True,
+                                     max_concurrent_requests: int = 8,
+                                     batch_size: int = 20,
+                                     bulk_write_size: int = 500):
 
     mongo_database = MongoDatabaseManager()
 
-    collection = mongo_database.get_collection(collection_name)
-    all_entries = await collection.find().to_list(length=None)
-    random.shuffle(all_entries)
-    logger.info("Parsing green check messages")
-
-    for entry in all_entries:
-
-        print("=====================================================================================================")
-        print(f"Green Check Messages for student: {entry['_student_name']}\n")
-        print("=====================================================================================================")
-
-        messages = entry["green_check_messages"]
-        if len(messages) == 0:
-            raise ValueError(f"Student {entry['_student_name']} has no green check messages")
-
-
-        messages = "\n".join(messages)
-        parsed_output = await parser.aparse_input(input_text=messages)
+    cache = None
+    if use_cache:
+        cache = SemanticCache(mongo_database=mongo_database,
+                              collection_name=GREEN_CHECK_CACHE_COLLECTION_NAME)
+    parser = GreenCheckMessageParser(cache=cache)
 
-
-        await mongo_database.upsert(
-            collection=collection_name,
-            query={"_student_name": entry["_student_name"]},
-            data={"$set": {"parsed_output_dict": parsed_output.dict(),
-                           "parsed_output_string": str(parsed_output),
-                           "messages": messages,
-                           }}
-        )
+    collection = mongo_database.get_collection(collection_name)
+    # only the ids are held in memory (and shuffled) - the full documents are streamed in chunk by chunk
+    entry_ids = [document["_id"] async for document in collection.find({}, projection={"_id": 1})]
+    random.shuffle(entry_ids)
+    logger.info(f"Parsing green check messages for {len(entry_ids)} entries")
+
+    chunk_queue = asyncio.Queue(maxsize=max_concurrent_requests)
+    write_queue = asyncio.Queue()
+
+    async def _bulk_writer():
+        operations = []
+        while True:
+            operation = await write_queue.get()
+            if operation is None:
+                break
+            operations.append(operation)
+            if len(operations) >= bulk_write_size:
+                await mongo_database.bulk_upsert(collection=collection_name, operations=operations)
+                operations = []
+        await mongo_database.bulk_upsert(collection=collection_name, operations=operations)
+
+    async def _save_entry(entry, messages: str, parsed_output: PaperSummary):
+        rendered_output = str(parsed_output)
+        await write_queue.put(UpdateOne({"_student_name": entry["_student_name"]},
+                                        {"$set": {"parsed_output_dict": parsed_output.dict(),
+                                                  "parsed_output_string": rendered_output,
+                                                  "messages": messages,
+                                                  }},
+                                        upsert=True))
         student_initials = get_initials(entry["_student_name"])
 
-        save_green_check_entry_to_markdown(base_summary_name="green_check_messages",
-                                           text=str(parsed_output),
-                                           file_name=f"{student_initials}_{parsed_output.summary_title}", )
+        await save_green_check_entry_to_markdown_async(base_summary_name="green_check_messages",
+                                                       text=rendered_output,
+                                                       file_name=f"{student_initials}_{parsed_output.summary_title}", )
 
+        print("=====================================================================================================")
         print(f"Student: {entry['_student_name']}: \n"
               f"Messages with green check: \n{messages}\n"
-              f"Parsed output: \n{parsed_output}")
+              f"Parsed output: \n{rendered_output}")
+
+    async def _process_chunk(chunk):
+        chunk_messages = ["\n".join(entry["green_check_messages"]) for entry in chunk]
+        parsed_outputs = await parser.aparse_batch(chunk_messages)
+
+        await asyncio.gather(*[_save_entry(entry, messages, parsed_output)
+                               for entry, messages, parsed_output in zip(chunk, chunk_messages, parsed_outputs)
+                               if parsed_output is not None])
+
+    async def _chunk_producer():
+        for i in range(0, len(entry_ids), batch_size):
+            chunk = []
+            async for entry in collection.find({"_id": {"$in": entry_ids[i:i + batch_size]}}).batch_size(batch_size):
+                if len(entry["green_check_messages"]) == 0:
+                    logger.error(f"Student {entry['_student_name']} has no green check messages")
+                    continue
+                chunk.append(entry)
+            if chunk:
+                await chunk_queue.put(chunk)
+
+        for _ in range(max_concurrent_requests):
+            await chunk_queue.put(None)
+
+    async def _chunk_consumer():
+        while True:
+            chunk = await chunk_queue.get()
+            if chunk is None:
+                break
+            try:
+                await _process_chunk(chunk)
+            except Exception as e:
+                student_names = [entry["_student_name"] for entry in chunk]
+                logger.error(f"Failed to parse green check messages for students {student_names}: {e}")
+
+    writer_task = asyncio.create_task(_bulk_writer())
+
+    await asyncio.gather(_chunk_producer(),
+                         *[_chunk_consumer() for _ in range(max_concurrent_requests)])
+
+    await write_queue.put(None)
+    await writer_task
 
     if save_to_json:
         await mongo_database.save_json(collection_name=collection_name)
 
 
-def save_green_check_entry_to_markdown(base_summary_name: str,
-                                       text:str,
-                                       file_name: str,
-                                       subfolder: str = None,
-                                       save_path: Union[str, Path] = None,
-                                       ):
-    load_dotenv()
+async def save_green_check_entry_to_markdown_async(base_summary_name: str,
+                                                   text: str,
+                                                   file_name: str,
+                                                   subfolder: str = None,
+                                                   save_path: Union[str, Path] = None,
+                                                   ):
     if not save_path:
-        save_path = Path(
-            os.getenv(
-                "PATH_TO_COURSE_DROPBOX_FOLDER")) / "course_data" / "chatbot_data" / base_summary_name
+        save_path = Path(_COURSE_DROPBOX_FOLDER_PATH) / "course_data" / "chatbot_data" / base_summary_name
+    save_path = Path(save_path)
     if subfolder:
         save_path = save_path / subfolder
 
-    save_path.mkdir(parents=True, exist_ok=True)
-
     clean_file_name = file_name.replace(":", "_").replace(".", "_").replace(" ", "_")
     clean_file_name += ".md"
 
     save_path = save_path / clean_file_name
 
-    with open(str(save_path), 'w', encoding='utf-8') as f:
-        f.write(text)
+    await asyncio.to_thread(_write_file, save_path, text)
 
     print(f"Markdown file generated and saved at {str(save_path)}.")
 
 
+def _write_file(path: Path, text: str):
+    if path.parent not in _MADE_DIRS:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _MADE_DIRS.add(path.parent)
+
+    with open(str(path), 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(grab_green_check_messages(server_name="Neural Control of Real World Human Movement 2023 Summer1",
                                           overwrite=True,
                                           save_to_json=True,
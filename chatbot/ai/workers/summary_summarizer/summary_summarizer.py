@@ -4,11 +4,11 @@ import os
 import tiktoken
 from dotenv import load_dotenv
 from langchain import LLMChain
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 from langchain.chat_models import ChatOpenAI, ChatAnthropic
 from langchain.memory import ConversationBufferMemory
 from langchain.prompts import HumanMessagePromptTemplate, ChatPromptTemplate, SystemMessagePromptTemplate
 
+from chatbot.ai.callbacks.batching_stdout_handler import BatchingStdOutHandler
 from chatbot.ai.workers.video_chatter_summary_builder.video_chatter_summary_builder_prompts import \
     VIDEO_CHATTER_SUMMARY_RESPONSE_SCHEMA, VIDEO_CHATTER_SCHEMATIZED_SUMMARY_SYSTEM_TEMPLATE, \
     VIDEO_CHATTER_META_SUMMARY_HUMAN_INPUT_PROMPT
@@ -57,7 +57,7 @@ class SummarySummarizer:
         else:
             self.llm = ChatOpenAI(model_name='gpt-4',
                                   temperature=0,
-                                  callbacks=[StreamingStdOutCallbackHandler()],
+                                  callbacks=[BatchingStdOutHandler()],
                                   streaming=True,
                                   )
             self.llm_model = self.llm.model_name
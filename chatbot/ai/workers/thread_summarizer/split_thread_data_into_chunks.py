@@ -1,20 +1,28 @@
 from typing import List, Any, Dict
 
-from langchain import OpenAI
+from chatbot.ai.utilities.token_counting import num_tokens_from_strings
+
+# the model `langchain.OpenAI` counts tokens for by default
+TOKEN_COUNT_MODEL = "text-davinci-003"
 
 
 def split_thread_data_into_chunks(messages: List[str],
                                   max_tokens_per_chunk: int = 1000) -> List[Dict[str, Any]]:
+    lines = [message + "\n" for message in messages]
+    # count each message once up front and keep a running total, rather than re-counting the whole chunk every time
+    line_token_counts = num_tokens_from_strings(lines, model=TOKEN_COUNT_MODEL)
+
     chunk = ""
     chunks = []
     token_count = 0
-    for message in messages:
-        chunk += message + "\n"
-        token_count = OpenAI().get_num_tokens(chunk)
+    for line, line_token_count in zip(lines, line_token_counts):
+        chunk += line
+        token_count += line_token_count
         if token_count > max_tokens_per_chunk * .9:  # avoid spilling over token buffer to avoid warnings
             chunks.append({"text": chunk,
                            "token_count": token_count, })
-            chunk = message + "\n"  # overlap chunks by one message
+            chunk = line  # overlap chunks by one message
+            token_count = line_token_count
 
     if chunk != "":
         chunks.append({"text": chunk,
@@ -3,11 +3,12 @@ import os
 from typing import List, Any, Dict
 
 from langchain import OpenAI, PromptTemplate
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 from langchain.chains.summarize import load_summarize_chain
 from langchain.chat_models import ChatAnthropic
 from langchain.schema import Document
 
+from chatbot.ai.callbacks.batching_stdout_handler import BatchingStdOutHandler
+
 
 # os.environ["LANGCHAIN_TRACING"] = "true"
 
@@ -43,7 +44,7 @@ class ThreadSummarizer:
                 raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
             self.llm = ChatAnthropic(temperature=0,
                                      max_tokens_to_sample=1000,
-                                     callbacks=[StreamingStdOutCallbackHandler()],
+                                     callbacks=[BatchingStdOutHandler()],
 )
             self.llm_model = self.llm.model
             self.dollars_per_token = 0.00000163
@@ -1,28 +1,31 @@
 import logging
-import os
 from datetime import datetime
 
-import tiktoken
-from dotenv import load_dotenv
 from langchain import LLMChain
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 from langchain.chat_models import ChatOpenAI, ChatAnthropic
 from langchain.memory import ConversationBufferMemory
 from langchain.prompts import HumanMessagePromptTemplate, ChatPromptTemplate, SystemMessagePromptTemplate
 from langchain.schema import AIMessage, HumanMessage
 
+from chatbot.ai.callbacks.batching_stdout_handler import BatchingStdOutHandler
 from chatbot.ai.workers.video_chatter_summary_builder.video_chatter_summary_builder_prompts import \
     VIDEO_CHATTER_META_SUMMARY_HUMAN_INPUT_PROMPT, \
     VIDEO_CHATTER_FIRST_HUMAN_INPUT_PROMPT, VIDEO_CHATTER_SUMMARY_RESPONSE_SCHEMA, \
     VIDEO_CHATTER_SCHEMATIZED_SUMMARY_SYSTEM_TEMPLATE, VIDEO_CHATTER_INDIVIDUAL_SUMMARY_HUMAN_INPUT_PROMPT
+from chatbot.system.environment_variables import get_anthropic_api_key
 
 MAX_TOKEN_COUNT = 2048
 DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
 
-load_dotenv()
-
 logger = logging.getLogger(__name__)
 
+# the response schema never changes, so substitute it into the system prompt once at import rather than per builder
+_SCHEMATIZED_SUMMARY_SYSTEM_MESSAGE_PROMPT = SystemMessagePromptTemplate.from_template(
+    template=VIDEO_CHATTER_SCHEMATIZED_SUMMARY_SYSTEM_TEMPLATE,
+    input_variables=["response_schema"])
+_SCHEMATIZED_SUMMARY_SYSTEM_MESSAGE_PROMPT.prompt = _SCHEMATIZED_SUMMARY_SYSTEM_MESSAGE_PROMPT.prompt.partial(
+    response_schema=VIDEO_CHATTER_SUMMARY_RESPONSE_SCHEMA, )
+
 
 class VideoChatterSummaryBuilder:
     def __init__(self,
@@ -37,7 +40,7 @@ class VideoChatterSummaryBuilder:
         self.video_chatter_summary_builder_prompt = self._create_chat_prompt(current_summary=current_summary)
         self._memory = ConversationBufferMemory()
         if use_anthropic:
-            if os.getenv("ANTHROPIC_API_KEY") is None:
+            if get_anthropic_api_key() is None:
                 raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
             self.llm = ChatAnthropic(temperature=0, max_tokens_to_sample=1000)
             self.llm_model = self.llm.model
@@ -45,7 +48,7 @@ class VideoChatterSummaryBuilder:
         else:
             self.llm = ChatOpenAI(model_name='gpt-4',
                                   temperature=0,
-                                  callbacks=[StreamingStdOutCallbackHandler()],
+                                  callbacks=[BatchingStdOutHandler()],
                                   streaming=True,
                                   max_tokens=4000,
                                   )
@@ -59,12 +62,6 @@ class VideoChatterSummaryBuilder:
                                    )
 
     def _create_chat_prompt(self, current_summary: str):
-        system_message_prompt = SystemMessagePromptTemplate.from_template(
-            template=VIDEO_CHATTER_SCHEMATIZED_SUMMARY_SYSTEM_TEMPLATE,
-            input_variables=["response_schema"])
-        system_message_prompt.prompt = system_message_prompt.prompt.partial(
-            response_schema=VIDEO_CHATTER_SUMMARY_RESPONSE_SCHEMA, )
-
         human_message_prompt = HumanMessagePromptTemplate.from_template(
             template=VIDEO_CHATTER_INDIVIDUAL_SUMMARY_HUMAN_INPUT_PROMPT,
             input_variables=["student_initials",
@@ -72,7 +69,7 @@ class VideoChatterSummaryBuilder:
                              ]
         )
         return ChatPromptTemplate.from_messages(
-            [system_message_prompt,human_message_prompt]
+            [_SCHEMATIZED_SUMMARY_SYSTEM_MESSAGE_PROMPT, human_message_prompt]
         )
 
     async def update_video_chatter_summary_based_on_new_conversation(self,
@@ -94,10 +91,3 @@ def time_since_last_summary(video_chatter_summary_entry):
     time_since_last_summary = current_time - previous_summary_datetime
     time_since_last_summary_in_hours = time_since_last_summary.total_seconds() / 3600
     return time_since_last_summary_in_hours
-
-
-def num_tokens_from_string(string: str, model: str) -> int:
-    """Returns the number of tokens in a text string."""
-    encoding = tiktoken.encoding_for_model(model)
-    num_tokens = len(encoding.encode(string))
-    return num_tokens
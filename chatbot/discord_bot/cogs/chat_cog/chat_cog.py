@@ -5,6 +5,7 @@ from datetime import datetime
 import discord
 
 from chatbot.ai.assistants.course_assistant.course_assistant import CourseAssistant
+from chatbot.ai.chat_llm import create_chat_llm
 from chatbot.ai.assistants.course_assistant.prompts.general_course_assistant_prompt import \
     GENERAL_COURSE_ASSISTANT_SYSTEM_TEMPLATE
 from chatbot.ai.assistants.course_assistant.prompts.project_manager_prompt import PROJECT_MANAGER_TASK_PROMPT
@@ -29,9 +30,13 @@ class ChatCog(discord.Cog):
         self._discord_bot = bot
         self._mongo_database = mongo_database_manager
         self._active_threads = {}
-        self._allowed_channels = os.getenv("ALLOWED_CHANNELS").split(",")
-        self._allowed_channels = [int(channel) for channel in self._allowed_channels]
+        self._allowed_channels = frozenset(int(channel) for channel in os.getenv("ALLOWED_CHANNELS", "").split(",")
+                                           if channel)
+        # ADMIN_USER_IDS is optional - without it the bot still starts, it just has no admin users
+        self._admin_users = frozenset(get_admin_users()) if os.getenv("ADMIN_USER_IDS") else frozenset()
         self._course_assistant_llm_chains = {}
+        # one client shared by every thread's assistant, so new threads don't rebuild it
+        self._shared_llm = create_chat_llm()
 
     @discord.slash_command(name="chat", description="Chat with the bot")
     @discord.option(name="use_project_manager_prompt?",
@@ -83,7 +88,7 @@ class ChatCog(discord.Cog):
                 return
 
             # Make sure we're only responding to the admin users
-            if not payload.user_id in get_admin_users():
+            if not payload.user_id in self._admin_users:
                 logger.info(f"User {payload.user_id} is not an admin user")
                 return
 
@@ -108,6 +113,9 @@ class ChatCog(discord.Cog):
         if message.author.id == self._discord_bot.user.id:
             return
 
+        # Nothing to respond to (e.g. embed or attachment-only messages)
+        if not message.content:
+            return
 
         if message.channel.parent_id == VIDEO_CHAT_CHANNEL_ID:
             return
@@ -122,7 +130,7 @@ class ChatCog(discord.Cog):
             return
 
         # ignore if first character is ~
-        if message.content[0] == "~":
+        if message.content.startswith("~"):
             return
         try:
             chat = self._active_threads[thread.id]
@@ -213,6 +221,7 @@ class ChatCog(discord.Cog):
 
         assistant = CourseAssistant(prompt=prompt,
                                     student_summary=student_summary,
+                                    llm=self._shared_llm,
                                     )
         if thread.message_count > 0:
             message = await thread.send(
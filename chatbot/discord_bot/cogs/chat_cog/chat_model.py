@@ -3,7 +3,7 @@ from datetime import datetime
 from typing import Union, List
 
 import discord
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from chatbot.ai.assistants.course_assistant.course_assistant import CourseAssistant
 from chatbot.ai.assistants.video_chatter.video_chatter import VideoChatter
@@ -14,8 +14,9 @@ class Chat(BaseModel):
     thread: discord.Thread
     assistant: Union[CourseAssistant, VideoChatter]
 
-    started_at: str = datetime.now().isoformat()
-    chat_id: str = uuid.uuid4()
+    started_at: str = Field(default_factory=lambda: datetime.now().isoformat())
+    chat_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    messages: List = Field(default_factory=list)
 
     class Config:
         arbitrary_types_allowed = True
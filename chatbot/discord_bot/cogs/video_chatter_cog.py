@@ -5,8 +5,10 @@ from datetime import datetime
 import discord
 
 from chatbot.ai.assistants.video_chatter.video_chatter import VideoChatter
+from chatbot.ai.vector_embeddings.semantic_cache import SemanticCache
 from chatbot.discord_bot.cogs.chat_cog.chat_model import Chat
 from chatbot.mongo_database.mongo_database_manager import MongoDatabaseManager
+from chatbot.system.filenames_and_paths import VIDEO_CHATTER_RESPONSE_CACHE_COLLECTION_NAME
 
 TIME_PASSED_MESSAGE = """
 > Some time passed and your memory of this conversation reset needed to be reloaded from the thread, but we're good now!
@@ -29,6 +31,9 @@ class VideoChatterCog(discord.Cog):
         self._active_threads = {}
         self._allowed_channels = [VIDEO_CHAT_CHANNEL_ID, 1090810901017403392]
         self._course_assistant_llm_chains = {}
+        self._response_cache = SemanticCache(mongo_database=self._mongo_database,
+                                             collection_name=VIDEO_CHATTER_RESPONSE_CACHE_COLLECTION_NAME,
+                                             similarity_threshold=0.95)
 
     @discord.slash_command(name="video_chatter", description="Chat with the bot about a video!")
     async def chat(self,
@@ -58,6 +63,10 @@ class VideoChatterCog(discord.Cog):
         if message.author.id == self._discord_bot.user.id:
             return
 
+        # Nothing to respond to (e.g. embed or attachment-only messages)
+        if not message.content:
+            return
+
         # Only respond to messages in threads
         if not message.channel.__class__ == discord.Thread:
             return
@@ -73,7 +82,7 @@ class VideoChatterCog(discord.Cog):
             return
 
         # ignore if first character is ~
-        if message.content[0] == "~":
+        if message.content.startswith("~"):
             return
         try:
             chat = self._active_threads[thread.id]
@@ -150,7 +159,8 @@ class VideoChatterCog(discord.Cog):
                              student_discord_username: str,
                              use_project_manager_prompt: bool = False) -> VideoChatter:
 
-        assistant = VideoChatter()
+        assistant = VideoChatter(semantic_cache=self._response_cache,
+                                 use_exact_cache=True)
         if thread.message_count > 0:
             message = await thread.send(
                 f"> Reloading bot memory from thread history...")
@@ -1,14 +1,17 @@
+import asyncio
 import json
 import logging
 import os
 import traceback
+import weakref
 from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
-from typing import Union, Any
+from typing import Union, Any, List
 
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
 
 from chatbot.system.filenames_and_paths import clean_path_string, get_default_database_json_save_path, \
     STUDENT_SUMMARIES_COLLECTION_NAME
@@ -50,8 +53,27 @@ def default_serialize(o: Any) -> str:
     return str(o)
 
 class MongoDatabaseManager:
+    # one manager (and so one motor connection pool) per event loop - motor clients can't be shared across loops
+    _instances_by_loop = weakref.WeakKeyDictionary()
+
+    def __new__(cls, *args, **kwargs):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # no running loop yet (e.g. created right before `asyncio.run`) - we can't know which loop it will
+            # end up on, so don't share it
+            return super().__new__(cls)
+
+        if loop not in cls._instances_by_loop:
+            cls._instances_by_loop[loop] = super().__new__(cls)
+        return cls._instances_by_loop[loop]
+
     def __init__(self, ):
-        self._client = AsyncIOMotorClient(get_mongo_uri())
+        if getattr(self, "_client", None) is not None:
+            return
+        self._client = AsyncIOMotorClient(get_mongo_uri(),
+                                          maxPoolSize=50,
+                                          minPoolSize=5)
         self._database = self._client.get_default_database(get_mongo_database_name())
 
     @property
@@ -70,6 +92,11 @@ class MongoDatabaseManager:
     async def upsert(self, collection, query, data):
         return await self._database[collection].update_one(query, data, upsert=True)
 
+    async def bulk_upsert(self, collection, operations: List[UpdateOne]):
+        if len(operations) == 0:
+            return None
+        return await self._database[collection].bulk_write(operations, ordered=False)
+
     async def save_json(self,
                   collection_name: str,
                   query: dict = None,
@@ -108,6 +135,9 @@ class MongoDatabaseManager:
 
     async def close(self):
         self._client.close()
+        for loop, instance in list(self._instances_by_loop.items()):
+            if instance is self:
+                del self._instances_by_loop[loop]
 
     async def get_student_summary(self, discord_username: str):
         student_entry = await self._database[STUDENT_SUMMARIES_COLLECTION_NAME].find_one(
@@ -118,7 +148,6 @@ class MongoDatabaseManager:
         return student_entry["student_summary"]["summary"]
 
 if __name__ == "__main__":
-    import asyncio
     # Replace 'your_mongodb_uri' with your actual MongoDB URI
     mongodb_manager = MongoDatabaseManager()  # run locally
 
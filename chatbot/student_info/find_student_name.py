@@ -1,17 +1,13 @@
 import json
-import os
 import uuid
 from pathlib import Path
 
-from dotenv import load_dotenv
-
 from chatbot.student_info.load_student_info import load_student_info
+from chatbot.system.environment_variables import get_uuid_map_json_path
 
 
 def get_or_create_uuid(student_name:str):
-    load_dotenv()
-
-    uuid_map_json_path = os.getenv("UUID_MAP_JSON_PATH")
+    uuid_map_json_path = get_uuid_map_json_path()
 
     if uuid_map_json_path is None:
         raise ValueError("UUID_MAP_JSON_PATH environment variable is not set.")
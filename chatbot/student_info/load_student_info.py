@@ -1,21 +1,20 @@
 import csv
 import json
 import logging
-import os
 from pathlib import Path
 from typing import Dict, Any
 
 import discord
 import pandas as pd
-from dotenv import load_dotenv
+
+from chatbot.system.environment_variables import get_student_info_csv_path, get_student_info_json_path
 
 logger = logging.getLogger(__name__)
 
 
 def load_student_info()-> Dict[str, Any]:
-    load_dotenv()
     student_info = {}
-    with open(os.getenv('PATH_TO_STUDENT_INFO_CSV'), 'r') as f:
+    with open(get_student_info_csv_path(), 'r') as f:
         reader = csv.reader(f)
         header = next(reader)
         for row in reader:
@@ -26,12 +25,12 @@ def load_student_info()-> Dict[str, Any]:
 
 def update_student_info(student_info: Dict[str, Any]):
     info_df = pd.DataFrame.from_dict(student_info, orient='index')
-    csv_save_path = os.getenv('PATH_TO_STUDENT_INFO_CSV')
+    csv_save_path = get_student_info_csv_path()
     Path(csv_save_path).parent.mkdir(parents=True, exist_ok=True)
     info_df.to_csv(csv_save_path, index=False)
     logger.info(f"Updated student info CSV file at {csv_save_path}")
 
-    json_save_path = os.getenv('PATH_TO_STUDENT_INFO_JSON')
+    json_save_path = get_student_info_json_path()
     Path(json_save_path).parent.mkdir(parents=True, exist_ok=True)
     with open(json_save_path, 'w') as f:
         json.dump(student_info, f, indent=4)
@@ -12,6 +12,30 @@ def get_admin_users()->List[str]:
     return admin_users
 
 
+def get_openai_api_key() -> str:
+    return os.getenv('OPENAI_API_KEY')
+
+
+def get_anthropic_api_key() -> str:
+    return os.getenv('ANTHROPIC_API_KEY')
+
+
+def get_course_dropbox_folder_path() -> str:
+    return os.getenv('PATH_TO_COURSE_DROPBOX_FOLDER')
+
+
+def get_uuid_map_json_path() -> str:
+    return os.getenv('UUID_MAP_JSON_PATH')
+
+
+def get_student_info_csv_path() -> str:
+    return os.getenv('PATH_TO_STUDENT_INFO_CSV')
+
+
+def get_student_info_json_path() -> str:
+    return os.getenv('PATH_TO_STUDENT_INFO_JSON')
+
+
 def get_mongo_uri() -> str:
     is_docker = os.getenv('IS_DOCKER', False)
     if is_docker:
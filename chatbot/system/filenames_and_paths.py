@@ -13,6 +13,8 @@ STUDENT_SUMMARIES_COLLECTION_NAME = "student_summaries"
 STUDENT_STATISTICS_COLLECTION_NAME = "student_statistics"
 VIDEO_CHATTER_SUMMARIES_COLLECTION_NAME = "video_chatter_summaries"
 CLASS_SUMMARY_COLLECTION_NAME = "class_summary"
+GREEN_CHECK_CACHE_COLLECTION_NAME = "green_check_cache"
+VIDEO_CHATTER_RESPONSE_CACHE_COLLECTION_NAME = "video_chatter_response_cache"
 
 
 def os_independent_home_dir():
@@ -0,0 +1,91 @@
+import asyncio
+
+from chatbot.ai.vector_embeddings.semantic_cache import SemanticCache, normalize_text
+
+EMBEDDINGS = {
+    normalize_text("A paper about motor control"): [1.0, 0.0, 0.0],
+    normalize_text("A paper on motor control"): [0.99, 0.1, 0.0],
+    normalize_text("Something else entirely"): [0.0, 0.0, 1.0],
+}
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return EMBEDDINGS[text]
+
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = []
+
+    async def find(self):
+        for document in self.documents:
+            yield document
+
+    async def update_one(self, query, update, upsert=False):
+        self.documents.append(update["$set"])
+
+
+class FakeMongoDatabase:
+    def __init__(self):
+        self.collection = FakeCollection()
+
+    def get_collection(self, collection_name):
+        return self.collection
+
+
+def make_cache():
+    return SemanticCache(mongo_database=FakeMongoDatabase(),
+                         collection_name="test",
+                         similarity_threshold=0.95,
+                         embeddings=FakeEmbeddings())
+
+
+def test_miss_then_insert_then_exact_hit():
+    async def run():
+        cache = make_cache()
+        assert await cache.lookup("A paper about motor control") is None
+        await cache.insert("A paper about motor control", {"title": "motor"})
+        assert await cache.lookup("a paper  ABOUT motor control") == {"title": "motor"}
+        return cache
+
+    cache = asyncio.run(run())
+    assert len(cache._collection.documents) == 1
+
+
+def test_similar_input_hits_and_unrelated_input_misses():
+    async def run():
+        cache = make_cache()
+        await cache.insert("A paper about motor control", {"title": "motor"})
+        assert await cache.lookup("A paper on motor control") == {"title": "motor"}
+        assert await cache.lookup("Something else entirely") is None
+
+    asyncio.run(run())
+
+
+def test_insert_after_miss_reuses_the_embedding():
+    async def run():
+        cache = make_cache()
+        await cache.insert("Something else entirely", {"title": "other"})
+        assert await cache.lookup("A paper about motor control") is None
+        await cache.insert("A paper about motor control", {"title": "motor"})
+        return cache
+
+    cache = asyncio.run(run())
+    assert cache._embeddings_model.calls == 2
+
+
+def test_lookup_with_unseen_context_skips_the_embedding():
+    async def run():
+        cache = make_cache()
+        await cache.insert("A paper about motor control", {"title": "motor"}, context="turn one")
+        assert await cache.lookup("A paper on motor control", context="turn two") is None
+        assert await cache.lookup("A paper on motor control", context="turn one") == {"title": "motor"}
+        return cache
+
+    cache = asyncio.run(run())
+    assert cache._embeddings_model.calls == 2
@@ -0,0 +1,35 @@
+import pytest
+import tiktoken
+
+from chatbot.ai.utilities.token_counting import trim_text_to_token_limit
+
+MODEL = "text-davinci-003"
+
+
+# tiktoken downloads its encodings on first use, so these can't run offline with a cold cache
+@pytest.fixture(scope="module", autouse=True)
+def require_encoding():
+    try:
+        tiktoken.encoding_for_model(MODEL)
+    except Exception as e:
+        pytest.skip(f"tiktoken encoding for {MODEL} is unavailable: {e}")
+
+
+def test_short_text_is_unchanged():
+    text = "A short green check message about a paper"
+    assert trim_text_to_token_limit(text, model=MODEL, head_tokens=100, tail_tokens=100) == text
+
+
+def test_long_text_keeps_head_and_tail():
+    text = " ".join(f"word{i}" for i in range(5000))
+    trimmed = trim_text_to_token_limit(text, model=MODEL, head_tokens=50, tail_tokens=50)
+    assert len(trimmed) < len(text)
+    assert trimmed.startswith("word0 word1")
+    assert trimmed.endswith("word4998 word4999")
+
+
+def test_trimmed_text_is_deterministic():
+    text = " ".join(f"word{i}" for i in range(5000))
+    first = trim_text_to_token_limit(text, model=MODEL, head_tokens=50, tail_tokens=50)
+    second = trim_text_to_token_limit(text, model=MODEL, head_tokens=50, tail_tokens=50)
+    assert first == second